@@ -8,9 +8,14 @@ import os
 import logging
 from pathlib import Path
 from typing import Dict, List, Optional, Tuple, Any
+import certifi
+import httpx
 from dotenv import load_dotenv
 from azure.identity import ClientSecretCredential, CertificateCredential
-from msgraph import GraphServiceClient
+from kiota_authentication_azure.azure_identity_authentication_provider import AzureIdentityAuthenticationProvider
+from msgraph import GraphRequestAdapter, GraphServiceClient
+from msgraph.graph_request_adapter import options as graph_middleware_options
+from msgraph_core import GraphClientFactory
 
 # Configure logging
 logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(name)s - %(levelname)s - %(message)s')
@@ -39,6 +44,37 @@ for env_path in env_paths:
 if not env_loaded:
     logger.warning("No .env file found in any of the expected locations")
 
+# Graph HTTP client settings: one pooled HTTP/2 client is shared by all requests so
+# concurrent tool calls multiplex over kept-alive connections instead of
+# opening new TCP/TLS connections
+GRAPH_BASE_URL = "https://graph.microsoft.com/v1.0"
+GRAPH_HTTP_LIMITS = httpx.Limits(max_keepalive_connections=50, max_connections=100)
+GRAPH_HTTP_TIMEOUT = httpx.Timeout(100, connect=30)
+
+def create_graph_service_client(credential, scopes: List[str]) -> GraphServiceClient:
+    """Create a Graph client for a credential on the shared pooled HTTP/2 client settings.
+    
+    Args:
+        credential: Azure identity credential used to acquire tokens
+        scopes: OAuth scopes to request
+        
+    Returns:
+        GraphServiceClient: Microsoft Graph client using the default Graph middleware
+    """
+    http_client = GraphClientFactory.create_with_default_middleware(
+        client=httpx.AsyncClient(
+            base_url=GRAPH_BASE_URL,
+            http2=True,
+            limits=GRAPH_HTTP_LIMITS,
+            timeout=GRAPH_HTTP_TIMEOUT
+        ),
+        options=graph_middleware_options
+    )
+    auth_provider = AzureIdentityAuthenticationProvider(credential, scopes=scopes)
+    return GraphServiceClient(
+        request_adapter=GraphRequestAdapter(auth_provider, client=http_client)
+    )
+
 class AuthenticationError(Exception):
     """Custom exception for authentication errors"""
     pass
@@ -146,10 +182,7 @@ class GraphAuthManager:
                 client_secret=self.client_secret
             )
             
-            self._graph_client = GraphServiceClient(
-                credentials=credential,
-                scopes=self.scopes
-            )
+            self._graph_client = create_graph_service_client(credential, self.scopes)
             logger.info("Successfully created Graph client")
             return self._graph_client
             
@@ -255,10 +288,7 @@ def get_graph_client(auth_method=None, **kwargs):
 
         # Create and return the Graph client
         scopes = ['https://graph.microsoft.com/.default']
-        client = GraphServiceClient(
-            credentials=credential,
-            scopes=scopes
-        )
+        client = create_graph_service_client(credential, scopes)
         logging.info("Successfully created Graph client")
         return client
 
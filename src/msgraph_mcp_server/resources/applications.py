@@ -3,112 +3,246 @@
 This module provides access to Microsoft Graph application resources (app registrations).
 """
 
+import asyncio
 import logging
-from typing import Dict, List, Any, Optional
+import operator
+import time
+from contextlib import aclosing
+from urllib.parse import urlsplit
+from typing import Dict, List, Any, Optional, Tuple
+from utils.cache import async_ttl_cache
 from utils.graph_client import GraphClient
+from utils.paging import iter_pages
+from msgraph.generated.applications.applications_request_builder import ApplicationsRequestBuilder
+from msgraph.generated.applications.item.application_item_request_builder import ApplicationItemRequestBuilder
 from msgraph.generated.models.application import Application
+from msgraph.generated.models.app_role_assignment_collection_response import AppRoleAssignmentCollectionResponse
+from msgraph.generated.models.o_auth2_permission_grant_collection_response import OAuth2PermissionGrantCollectionResponse
+from msgraph_core.requests.batch_request_content import BatchRequestContent
+from msgraph_core.requests.batch_request_item import BatchRequestItem
+from kiota_abstractions.base_request_configuration import RequestConfiguration
+from kiota_serialization_json.json_parse_node import JsonParseNode
 from .service_principals import get_service_principal_by_app_id
 
 logger = logging.getLogger(__name__)
 
+# Application properties returned to callers; requested via $select to keep payloads small
+_APPLICATION_SELECT = ["id", "appId", "displayName", "createdDateTime", "signInAudience", "publisherDomain", "tags"]
+# Reads the formatted application attributes in a single call
+_APPLICATION_FIELDS = operator.attrgetter(
+    'id', 'app_id', 'display_name', 'created_date_time', 'sign_in_audience', 'publisher_domain', 'tags'
+)
+
+# app_data keys applied by create_application and update_application
+_UPDATABLE_FIELDS = ("displayName", "signInAudience", "tags", "identifierUris", "web", "api", "requiredResourceAccess")
+
+# Service principals looked up by appId, cached as appId -> (monotonic timestamp, service principal)
+_SP_CACHE_TTL_SECONDS = 300
+_SP_CACHE: Dict[str, Tuple[float, Any]] = {}
+
+def clear_sp_cache() -> None:
+    """Clear the cache of service principals looked up by appId."""
+    _SP_CACHE.clear()
+
+async def _get_cached_service_principal(graph_client: GraphClient, app_id: str) -> Optional[Any]:
+    """Get a service principal by appId, reusing lookups made within the last few minutes.
+
+    Concurrent lookups of the same appId are already collapsed into one by the
+    single-flight cache on get_application_by_id, the only caller.
+    """
+    cached = _SP_CACHE.get(app_id)
+    if cached and time.monotonic() - cached[0] < _SP_CACHE_TTL_SECONDS:
+        return cached[1]
+    sp = await get_service_principal_by_app_id(graph_client, app_id)
+    # Only cache hits, so a service principal created later is picked up right away
+    if sp:
+        _SP_CACHE[app_id] = (time.monotonic(), sp)
+    return sp
+
+def _format_application(app) -> Dict[str, Any]:
+    """Format an application (app registration)."""
+    id_, app_id, display_name, created_dt, sign_in_audience, publisher_domain, tags = _APPLICATION_FIELDS(app)
+    return {
+        'id': id_ or '',
+        'appId': app_id or '',
+        'displayName': display_name or '',
+        'createdDateTime': created_dt.isoformat() if created_dt else '',
+        'signInAudience': sign_in_audience or '',
+        'publisherDomain': publisher_domain or '',
+        'tags': tags or [],
+    }
+
+@async_ttl_cache(ttl=60, maxsize=256)
 async def list_applications(graph_client: GraphClient, limit: int = 100) -> List[Dict[str, Any]]:
     """List all applications (app registrations) in the tenant, with paging."""
     try:
         client = graph_client.get_client()
-        response = await client.applications.get()
-        applications = []
-        if response and response.value:
-            applications.extend(response.value)
-        # Paging: fetch more if odata_next_link is present
-        while response is not None and getattr(response, 'odata_next_link', None) and len(applications) < limit:
-            response = await client.applications.with_url(response.odata_next_link).get()
-            if response and response.value:
-                applications.extend(response.value)
+        # Ask for at most limit records per page (Graph caps $top at 999) so small limits need one round trip
+        query_params = ApplicationsRequestBuilder.ApplicationsRequestBuilderGetQueryParameters(
+            select=_APPLICATION_SELECT,
+            top=max(1, min(limit, 999))
+        )
+        request_configuration = RequestConfiguration(query_parameters=query_params)
         formatted_apps = []
-        for app in applications[:limit]:
-            app_data = {
-                'id': getattr(app, 'id', '') or '',
-                'appId': getattr(app, 'app_id', '') or '',
-                'displayName': getattr(app, 'display_name', '') or '',
-                'createdDateTime': app.created_date_time.isoformat() if getattr(app, 'created_date_time', None) else '',
-                'signInAudience': getattr(app, 'sign_in_audience', '') or '',
-                'publisherDomain': getattr(app, 'publisher_domain', '') or '',
-                'tags': getattr(app, 'tags', []) or [],
-            }
-            formatted_apps.append(app_data)
+        # Paging: the next page is prefetched while the current one is formatted
+        async with aclosing(iter_pages(
+            client.applications.get(request_configuration=request_configuration),
+            lambda next_link: client.applications.with_url(next_link).get(),
+        )) as pages:
+            async for page in pages:
+                formatted_apps.extend(_format_application(app) for app in page[:limit - len(formatted_apps)])
+                if len(formatted_apps) >= limit:
+                    break
         return formatted_apps
     except Exception as e:
         logger.error(f"Error listing applications: {str(e)}")
         raise
 
+def _format_app_role_assignment(assignment) -> Dict[str, Any]:
+    """Format an appRoleAssignment of a service principal."""
+    created_dt = assignment.created_date_time
+    app_role_id = assignment.app_role_id
+    principal_id = assignment.principal_id
+    resource_id = assignment.resource_id
+    return {
+        'id': assignment.id or '',
+        'createdDateTime': created_dt.isoformat() if created_dt else '',
+        'appRoleId': str(app_role_id) if app_role_id else '',
+        'principalDisplayName': assignment.principal_display_name or '',
+        'principalId': str(principal_id) if principal_id else '',
+        'principalType': assignment.principal_type or '',
+        'resourceDisplayName': assignment.resource_display_name or '',
+        'resourceId': str(resource_id) if resource_id else '',
+    }
+
+def _format_oauth2_grant(grant) -> Dict[str, Any]:
+    """Format an oauth2PermissionGrant of a service principal."""
+    return {
+        'id': grant.id or '',
+        'clientId': grant.client_id or '',
+        'consentType': grant.consent_type or '',
+        'principalId': grant.principal_id or '',
+        'resourceId': grant.resource_id or '',
+        'scope': grant.scope or '',
+    }
+
+# Service principal sub-resources fetched together via $batch: key -> (collection response type, formatter)
+_SP_PERMISSION_COLLECTIONS = {
+    'appRoleAssignments': (AppRoleAssignmentCollectionResponse, _format_app_role_assignment),
+    'oauth2PermissionGrants': (OAuth2PermissionGrantCollectionResponse, _format_oauth2_grant),
+}
+
+# Attempts per $batch subrequest answered with 429 or 5xx, and the cap on the Retry-After wait between them
+_BATCH_MAX_ATTEMPTS = 3
+_BATCH_MAX_RETRY_AFTER_SECONDS = 30
+
+def _retry_after_seconds(item_response: Dict[str, Any], attempt: int) -> float:
+    """Get the delay before retrying a $batch subrequest from its Retry-After header, backing off exponentially without one."""
+    headers = {name.lower(): value for name, value in (item_response.get('headers') or {}).items()}
+    try:
+        delay = float(headers['retry-after'])
+    except (KeyError, TypeError, ValueError):
+        delay = 2 ** (attempt - 1)
+    return min(max(delay, 0), _BATCH_MAX_RETRY_AFTER_SECONDS)
+
+def _relative_graph_url(url: str) -> str:
+    """Strip the Graph host and API version from a URL, as required for $batch subrequests."""
+    parts = urlsplit(url)
+    if not parts.scheme:
+        return url
+    path = parts.path
+    for version in ('/v1.0', '/beta'):
+        if path.startswith(version + '/'):
+            path = path[len(version):]
+            break
+    # A base URL ending in "/" leaves "//" behind, which would read as a protocol-relative URL
+    path = '/' + path.lstrip('/')
+    return f"{path}?{parts.query}" if parts.query else path
+
+async def _fetch_sp_permissions(graph_client: GraphClient, sp_id: str) -> Dict[str, List[Dict[str, Any]]]:
+    """Fetch appRoleAssignments and oauth2PermissionGrants of a service principal.
+
+    Both collections are requested in a single JSON $batch call; any
+    @odata.nextLink is fed back into the next batch until every collection
+    has been fully paged. Subrequests throttled (429) or failing with a 5xx
+    status are retried after their Retry-After delay, up to
+    _BATCH_MAX_ATTEMPTS times; any other failing subrequest raises.
+    """
+    client = graph_client.get_client()
+    sp_request = client.service_principals.by_service_principal_id(sp_id)
+    builders = {
+        'appRoleAssignments': sp_request.app_role_assignments,
+        'oauth2PermissionGrants': sp_request.oauth2_permission_grants,
+    }
+    results = {key: [] for key in builders}
+    attempts = {key: 0 for key in builders}
+    pending = {key: builder.to_get_request_information() for key, builder in builders.items()}
+    while pending:
+        requests = pending
+        items = {}
+        for key, request_info in pending.items():
+            item = BatchRequestItem(request_information=request_info, id=key)
+            item.url = _relative_graph_url(item.url)
+            items[key] = item
+        # Decode the batch response as plain JSON: Graph returns JSON subresponse
+        # bodies as objects, which msgraph_core's BatchResponseItem drops (it only
+        # reads base64-encoded bodies)
+        batch_request_info = await client.batch.to_post_request_information(BatchRequestContent(items))
+        batch_response = await graph_client.get_json(batch_request_info) or {}
+        item_responses = {item.get('id'): item for item in batch_response.get('responses') or []}
+        pending = {}
+        retry_delay = 0
+        for key in items:
+            response_type, formatter = _SP_PERMISSION_COLLECTIONS[key]
+            item_response = item_responses.get(key) or {}
+            status = item_response.get('status')
+            body = item_response.get('body')
+            if status is not None and (status == 429 or status >= 500):
+                attempts[key] += 1
+                if attempts[key] < _BATCH_MAX_ATTEMPTS:
+                    logger.warning(f"Retrying {key} for service principal {sp_id} after HTTP status {status}")
+                    retry_delay = max(retry_delay, _retry_after_seconds(item_response, attempts[key]))
+                    pending[key] = requests[key]
+                    continue
+            if status is None or status >= 400 or not isinstance(body, dict):
+                raise Exception(f"Failed to fetch {key} for service principal {sp_id}: HTTP status {status}")
+            attempts[key] = 0
+            page = JsonParseNode(body).get_object_value(response_type)
+            if page.value:
+                results[key].extend(formatter(record) for record in page.value)
+            if page.odata_next_link:
+                pending[key] = builders[key].with_url(page.odata_next_link).to_get_request_information()
+        if retry_delay:
+            await asyncio.sleep(retry_delay)
+    return results
+
+@async_ttl_cache(ttl=60, maxsize=256)
 async def get_application_by_id(graph_client: GraphClient, app_id: str) -> Optional[Dict[str, Any]]:
     """Get a specific application by its object ID, including appRoleAssignments and oauth2PermissionGrants from the corresponding service principal."""
     try:
         client = graph_client.get_client()
-        app = await client.applications.by_application_id(app_id).get()
+        query_params = ApplicationItemRequestBuilder.ApplicationItemRequestBuilderGetQueryParameters(
+            select=_APPLICATION_SELECT
+        )
+        request_configuration = RequestConfiguration(query_parameters=query_params)
+        app = await client.applications.by_application_id(app_id).get(request_configuration=request_configuration)
         if app:
-            app_data = {
-                'id': getattr(app, 'id', '') or '',
-                'appId': getattr(app, 'app_id', '') or '',
-                'displayName': getattr(app, 'display_name', '') or '',
-                'createdDateTime': app.created_date_time.isoformat() if getattr(app, 'created_date_time', None) else '',
-                'signInAudience': getattr(app, 'sign_in_audience', '') or '',
-                'publisherDomain': getattr(app, 'publisher_domain', '') or '',
-                'tags': getattr(app, 'tags', []) or [],
-            }
+            app_data = _format_application(app)
             # Find the corresponding service principal by appId
-            sp = await get_service_principal_by_app_id(graph_client, getattr(app, 'app_id', None))
+            sp = await _get_cached_service_principal(graph_client, getattr(app, 'app_id', None))
             if sp:
                 sp_id = getattr(sp, 'id', None)
-                # Fetch appRoleAssignments and oauth2PermissionGrants using the same logic as in service_principals.py
-                # Fetch appRoleAssignments
-                app_role_assignments = []
+                # Fetch appRoleAssignments and oauth2PermissionGrants in one $batch round trip
                 try:
-                    response = await client.service_principals.by_service_principal_id(sp_id).app_role_assignments.get()
-                    while response:
-                        if response.value:
-                            for assignment in response.value:
-                                created_dt = getattr(assignment, 'created_date_time', None)
-                                app_role_assignments.append({
-                                    'id': getattr(assignment, 'id', '') or '',
-                                    'createdDateTime': created_dt.isoformat() if created_dt else '',
-                                    'appRoleId': str(getattr(assignment, 'app_role_id', '')) if getattr(assignment, 'app_role_id', None) else '',
-                                    'principalDisplayName': getattr(assignment, 'principal_display_name', '') or '',
-                                    'principalId': str(getattr(assignment, 'principal_id', '')) if getattr(assignment, 'principal_id', None) else '',
-                                    'principalType': getattr(assignment, 'principal_type', '') or '',
-                                    'resourceDisplayName': getattr(assignment, 'resource_display_name', '') or '',
-                                    'resourceId': str(getattr(assignment, 'resource_id', '')) if getattr(assignment, 'resource_id', None) else '',
-                                })
-                        if getattr(response, 'odata_next_link', None):
-                            response = await client.service_principals.by_service_principal_id(sp_id).app_role_assignments.with_url(response.odata_next_link).get()
-                        else:
-                            break
+                    permissions = await _fetch_sp_permissions(graph_client, sp_id)
                 except Exception as e:
-                    logger.warning(f"Error fetching appRoleAssignments for service principal {sp_id}: {str(e)}")
-                app_data['appRoleAssignments'] = app_role_assignments
-
-                # Fetch oauth2PermissionGrants
-                oauth2_permission_grants = []
-                try:
-                    response = await client.service_principals.by_service_principal_id(sp_id).oauth2_permission_grants.get()
-                    while response:
-                        if response.value:
-                            for grant in response.value:
-                                oauth2_permission_grants.append({
-                                    'id': getattr(grant, 'id', '') or '',
-                                    'clientId': getattr(grant, 'client_id', '') or '',
-                                    'consentType': getattr(grant, 'consent_type', '') or '',
-                                    'principalId': getattr(grant, 'principal_id', '') or '',
-                                    'resourceId': getattr(grant, 'resource_id', '') or '',
-                                    'scope': getattr(grant, 'scope', '') or '',
-                                })
-                        if getattr(response, 'odata_next_link', None):
-                            response = await client.service_principals.by_service_principal_id(sp_id).oauth2_permission_grants.with_url(response.odata_next_link).get()
-                        else:
-                            break
-                except Exception as e:
-                    logger.warning(f"Error fetching oauth2PermissionGrants for service principal {sp_id}: {str(e)}")
-                app_data['oauth2PermissionGrants'] = oauth2_permission_grants
+                    logger.warning(f"Error fetching appRoleAssignments and oauth2PermissionGrants for service principal {sp_id}: {str(e)}")
+                    permissions = {}
+                    # Don't cache the application without its permissions: invalidating
+                    # while this call is in flight skips storing its result
+                    get_application_by_id.cache_invalidate(graph_client, app_id)
+                app_data['appRoleAssignments'] = permissions.get('appRoleAssignments', [])
+                app_data['oauth2PermissionGrants'] = permissions.get('oauth2PermissionGrants', [])
             else:
                 app_data['appRoleAssignments'] = []
                 app_data['oauth2PermissionGrants'] = []
@@ -118,6 +252,12 @@ async def get_application_by_id(graph_client: GraphClient, app_id: str) -> Optio
         logger.error(f"Error getting application {app_id}: {str(e)}")
         raise
 
+def cache_invalidate(graph_client: GraphClient, app_id: Optional[str] = None) -> None:
+    """Drop cached application reads after a write, for app_id if given."""
+    list_applications.cache_clear()
+    if app_id:
+        get_application_by_id.cache_invalidate(graph_client, app_id)
+
 async def create_application(graph_client: GraphClient, app_data: Dict[str, Any]) -> Dict[str, Any]:
     """Create a new application (app registration)."""
     try:
@@ -139,23 +279,16 @@ async def create_application(graph_client: GraphClient, app_data: Dict[str, Any]
         if 'requiredResourceAccess' in app_data:
             app.required_resource_access = app_data['requiredResourceAccess']
         new_app = await client.applications.post(app)
+        cache_invalidate(graph_client)
         if new_app:
-            return {
-                'id': getattr(new_app, 'id', '') or '',
-                'appId': getattr(new_app, 'app_id', '') or '',
-                'displayName': getattr(new_app, 'display_name', '') or '',
-                'createdDateTime': new_app.created_date_time.isoformat() if getattr(new_app, 'created_date_time', None) else '',
-                'signInAudience': getattr(new_app, 'sign_in_audience', '') or '',
-                'publisherDomain': getattr(new_app, 'publisher_domain', '') or '',
-                'tags': getattr(new_app, 'tags', []) or [],
-            }
+            return _format_application(new_app)
         raise Exception("Failed to create application")
     except Exception as e:
         logger.error(f"Error creating application: {str(e)}")
         raise
 
-async def update_application(graph_client: GraphClient, app_id: str, app_data: Dict[str, Any]) -> Dict[str, Any]:
-    """Update an existing application (app registration)."""
+async def update_application(graph_client: GraphClient, app_id: str, app_data: Dict[str, Any], return_full: bool = False) -> Dict[str, Any]:
+    """Update an existing application (app registration), returning the full application only if return_full is set."""
     try:
         client = graph_client.get_client()
         app = Application()
@@ -174,9 +307,17 @@ async def update_application(graph_client: GraphClient, app_id: str, app_data: D
             app.api = app_data['api']
         if 'requiredResourceAccess' in app_data:
             app.required_resource_access = app_data['requiredResourceAccess']
-        await client.applications.by_application_id(app_id).patch(app)
-        # Return the updated application
-        return await get_application_by_id(graph_client, app_id)
+        request_configuration = RequestConfiguration()
+        request_configuration.headers.add("Prefer", "return=representation")
+        patched_app = await client.applications.by_application_id(app_id).patch(app, request_configuration=request_configuration)
+        cache_invalidate(graph_client, app_id)
+        if return_full:
+            # Return the updated application with its service principal's permissions
+            return await get_application_by_id(graph_client, app_id)
+        if patched_app:
+            return _format_application(patched_app)
+        # Graph sent no body back, so confirm what was set
+        return {'id': app_id, **{key: value for key, value in app_data.items() if key in _UPDATABLE_FIELDS}}
     except Exception as e:
         logger.error(f"Error updating application {app_id}: {str(e)}")
         raise
@@ -186,6 +327,7 @@ async def delete_application(graph_client: GraphClient, app_id: str) -> bool:
     try:
         client = graph_client.get_client()
         await client.applications.by_application_id(app_id).delete()
+        cache_invalidate(graph_client, app_id)
         return True
     except Exception as e:
         logger.error(f"Error deleting application {app_id}: {str(e)}")
@@ -1,92 +1,136 @@
 import logging
-from typing import Dict, List, Any
+import operator
+from contextlib import aclosing
+from typing import AsyncIterator, Dict, List, Any
 from datetime import datetime, timedelta, timezone
 from msgraph.generated.audit_logs.directory_audits.directory_audits_request_builder import DirectoryAuditsRequestBuilder
+from msgraph.generated.models.operation_result import OperationResult
 from kiota_abstractions.base_request_configuration import RequestConfiguration
+from utils.cache import async_ttl_cache
 from utils.graph_client import GraphClient
+from utils.odata import quote_odata
+from utils.paging import format_pages, iter_concurrently, iter_pages, time_range_filters
 
 logger = logging.getLogger(__name__)
 
-async def get_user_audit_logs(graph_client: GraphClient, user_id: str, days: int = 30) -> List[Dict[str, Any]]:
-    """Get all relevant directory audit logs for a user by user_id within the last N days (default 30), with paging support."""
+# Directory audit properties used by the formatter below; requested via $select
+_AUDIT_LOG_SELECT = [
+    "id", "activityDateTime", "activityDisplayName", "category", "operationType", "result",
+    "resultReason", "initiatedBy", "targetResources", "loggedByService", "correlationId", "additionalDetails",
+]
+# Reads the scalar directory audit attributes in a single call
+_AUDIT_LOG_FIELDS = operator.attrgetter(
+    'id', 'activity_date_time', 'activity_display_name', 'category', 'operation_type', 'result',
+    'result_reason', 'logged_by_service', 'correlation_id', 'additional_details',
+)
+# str() of every OperationResult member, computed once instead of per record
+_OPERATION_RESULT_STR = {result: str(result) for result in OperationResult}
+# Filter for one date window of a user's directory audits; uid must be passed through quote_odata
+_AUDIT_FILTER_TMPL = "initiatedBy/user/id eq '{uid}' and {range_filter}"
+
+def _format_audit_log(log) -> Dict[str, Any]:
+    """Format a directory audit record."""
+    (id_, activity_dt, activity_display_name, category, operation_type, result,
+     result_reason, logged_by_service, correlation_id, additional_details) = _AUDIT_LOG_FIELDS(log)
+    log_data = {
+        "id": id_ or '',
+        "activityDateTime": activity_dt.isoformat() if activity_dt else '',
+        "activityDisplayName": activity_display_name or '',
+        "category": category or '',
+        "operationType": operation_type or '',
+        "result": _OPERATION_RESULT_STR.get(result, ''),
+        "resultReason": result_reason or '',
+        "initiatedBy": {},
+        "targetResources": [],
+        "loggedByService": logged_by_service or '',
+        "correlationId": correlation_id or '',
+        "additionalDetails": [
+            {"key": kv.key or '', "value": kv.value or ''} for kv in additional_details
+        ] if additional_details else [],
+    }
+    # initiatedBy
+    ib = log.initiated_by
+    if ib:
+        user = ib.user
+        app = ib.app
+        log_data["initiatedBy"] = {
+            "user": {
+                "id": user.id or '',
+                "displayName": user.display_name or '',
+                "userPrincipalName": user.user_principal_name or ''
+            } if user else {},
+            "app": {
+                "appId": app.app_id or '',
+                "displayName": app.display_name or ''
+            } if app else {}
+        }
+    # targetResources
+    target_resources = log.target_resources
+    if target_resources:
+        formatted_targets = []
+        for tr in target_resources:
+            modified_properties = tr.modified_properties
+            formatted_targets.append({
+                "id": tr.id or '',
+                "displayName": tr.display_name or '',
+                "type": tr.type or '',
+                "userPrincipalName": tr.user_principal_name or '',
+                "modifiedProperties": [
+                    {
+                        "displayName": mp.display_name or '',
+                        "oldValue": mp.old_value or '',
+                        "newValue": mp.new_value or ''
+                    } for mp in modified_properties
+                ] if modified_properties else []
+            })
+        log_data["targetResources"] = formatted_targets
+    return log_data
+
+async def _fetch_audit_window(client, filter_query: str) -> AsyncIterator[List[Dict[str, Any]]]:
+    """Page through directory audits matching filter_query, newest first, yielding formatted chunks."""
+    query_params = DirectoryAuditsRequestBuilder.DirectoryAuditsRequestBuilderGetQueryParameters(
+        filter=filter_query,
+        select=_AUDIT_LOG_SELECT,
+        orderby=["activityDateTime desc"],
+        top=1000
+    )
+    request_configuration = RequestConfiguration(query_parameters=query_params)
+    request_configuration.headers.add("ConsistencyLevel", "eventual")
+    # Format pages while the following ones are fetched; only a few raw pages are kept alive at a time
+    async for chunk in format_pages(
+        iter_pages(
+            client.audit_logs.directory_audits.get(request_configuration=request_configuration),
+            lambda next_link: client.audit_logs.directory_audits.with_url(next_link).get(request_configuration=request_configuration),
+        ),
+        _format_audit_log,
+    ):
+        yield chunk
+
+async def stream_user_audit_logs(graph_client: GraphClient, user_id: str, days: int = 30) -> AsyncIterator[Dict[str, Any]]:
+    """Yield directory audit logs for a user by user_id within the last N days (default 30), newest first."""
     try:
         client = graph_client.get_client()
         end_date = datetime.now(timezone.utc)
         start_date = end_date - timedelta(days=days)
-        start_date_str = start_date.strftime('%Y-%m-%dT%H:%M:%SZ')
-        end_date_str = end_date.strftime('%Y-%m-%dT%H:%M:%SZ')
-        # Filter: initiatedBy/user/id eq '{user_id}' and activityDateTime in range
-        filter_query = f"initiatedBy/user/id eq '{user_id}' and activityDateTime ge {start_date_str} and activityDateTime le {end_date_str}"
         logger.info(f"Fetching directory audit logs for user ID: {user_id}")
-        logger.info(f"Date range: {start_date_str} to {end_date_str}")
-        logger.info(f"Filter query: {filter_query}")
-        query_params = DirectoryAuditsRequestBuilder.DirectoryAuditsRequestBuilderGetQueryParameters(
-            filter=filter_query,
-            orderby=["activityDateTime desc"],
-            top=1000
-        )
-        request_configuration = RequestConfiguration(query_parameters=query_params)
-        request_configuration.headers.add("ConsistencyLevel", "eventual")
-        response = await client.audit_logs.directory_audits.get(request_configuration=request_configuration)
-        logs = []
-        if response and response.value:
-            logs.extend(response.value)
-        while response is not None and getattr(response, 'odata_next_link', None):
-            response = await client.audit_logs.directory_audits.with_url(response.odata_next_link).get(request_configuration=request_configuration)
-            if response and response.value:
-                logs.extend(response.value)
-        formatted_logs = []
-        for log in logs:
-            log_data = {
-                "id": getattr(log, "id", '') or '',
-                "activityDateTime": log.activity_date_time.isoformat() if getattr(log, "activity_date_time", None) else '',
-                "activityDisplayName": getattr(log, "activity_display_name", '') or '',
-                "category": getattr(log, "category", '') or '',
-                "operationType": getattr(log, "operation_type", '') or '',
-                "result": str(getattr(log, "result", '')) if getattr(log, "result", None) else '',
-                "resultReason": getattr(log, "result_reason", '') or '',
-                "initiatedBy": {},
-                "targetResources": [],
-                "loggedByService": getattr(log, "logged_by_service", '') or '',
-                "correlationId": getattr(log, "correlation_id", '') or '',
-                "additionalDetails": [
-                    {"key": getattr(kv, 'key', '') or '', "value": getattr(kv, 'value', '') or ''} for kv in getattr(log, 'additional_details', [])
-                ] if hasattr(log, 'additional_details') and log.additional_details else [],
-            }
-            # initiatedBy
-            if hasattr(log, 'initiated_by') and log.initiated_by:
-                ib = log.initiated_by
-                log_data["initiatedBy"] = {
-                    "user": {
-                        "id": (getattr(ib.user, 'id', '') or '') if hasattr(ib, 'user') and ib.user else '',
-                        "displayName": (getattr(ib.user, 'display_name', '') or '') if hasattr(ib, 'user') and ib.user else '',
-                        "userPrincipalName": (getattr(ib.user, 'user_principal_name', '') or '') if hasattr(ib, 'user') and ib.user else ''
-                    } if hasattr(ib, 'user') and ib.user else {},
-                    "app": {
-                        "appId": (getattr(ib.app, 'app_id', '') or '') if hasattr(ib, 'app') and ib.app else '',
-                        "displayName": (getattr(ib.app, 'display_name', '') or '') if hasattr(ib, 'app') and ib.app else ''
-                    } if hasattr(ib, 'app') and ib.app else {}
-                }
-            # targetResources
-            if hasattr(log, 'target_resources') and log.target_resources:
-                log_data["targetResources"] = [
-                    {
-                        "id": getattr(tr, 'id', '') or '',
-                        "displayName": getattr(tr, 'display_name', '') or '',
-                        "type": getattr(tr, 'type', '') or '',
-                        "userPrincipalName": getattr(tr, 'user_principal_name', '') or '',
-                        "modifiedProperties": [
-                            {
-                                "displayName": getattr(mp, 'display_name', '') or '',
-                                "oldValue": getattr(mp, 'old_value', '') or '',
-                                "newValue": getattr(mp, 'new_value', '') or ''
-                            } for mp in getattr(tr, 'modified_properties', [])
-                        ] if hasattr(tr, 'modified_properties') and tr.modified_properties else []
-                    }
-                    for tr in log.target_resources
-                ]
-            formatted_logs.append(log_data)
-        return formatted_logs
+        logger.info(f"Date range: {start_date.strftime('%Y-%m-%dT%H:%M:%SZ')} to {end_date.strftime('%Y-%m-%dT%H:%M:%SZ')}")
+        # Filter: initiatedBy/user/id eq '{user_id}' and activityDateTime in one window of the range
+        uid = quote_odata(user_id)
+        filter_queries = [
+            _AUDIT_FILTER_TMPL.format(uid=uid, range_filter=range_filter)
+            for range_filter in time_range_filters("activityDateTime", start_date, end_date)
+        ]
+        logger.info(f"Filter queries: {filter_queries}")
+        async with aclosing(iter_concurrently(
+            _fetch_audit_window(client, filter_query) for filter_query in filter_queries
+        )) as logs:
+            async for log_data in logs:
+                yield log_data
     except Exception as e:
         logger.error(f"Error fetching directory audit logs for user {user_id}: {str(e)}")
-        raise 
\ No newline at end of file
+        raise
+
+@async_ttl_cache(ttl=60, maxsize=256)
+async def get_user_audit_logs(graph_client: GraphClient, user_id: str, days: int = 30) -> List[Dict[str, Any]]:
+    """Get all relevant directory audit logs for a user by user_id within the last N days (default 30), with paging support."""
+    return [log async for log in stream_user_audit_logs(graph_client, user_id, days)] 
\ No newline at end of file
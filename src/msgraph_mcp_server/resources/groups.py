@@ -8,6 +8,7 @@ from typing import Dict, List, Any, Optional
 from msgraph.generated.groups.groups_request_builder import GroupsRequestBuilder
 from msgraph.generated.models.group import Group
 from utils.graph_client import GraphClient
+from utils.odata import quote_odata
 
 logger = logging.getLogger(__name__)
 
@@ -161,7 +162,7 @@ async def create_group(graph_client: GraphClient, group_data: Dict[str, Any]) ->
         
         if display_name:
             # Check if a group with the same display name already exists
-            filter_query = f"displayName eq '{display_name}'"
+            filter_query = f"displayName eq '{quote_odata(display_name)}'"
             query_params = GroupsRequestBuilder.GroupsRequestBuilderGetQueryParameters(
                 filter=filter_query
             )
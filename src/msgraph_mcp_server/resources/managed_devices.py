@@ -3,6 +3,7 @@ from typing import Dict, List, Any, Optional
 from msgraph.generated.device_management.managed_devices.managed_devices_request_builder import ManagedDevicesRequestBuilder
 from kiota_abstractions.base_request_configuration import RequestConfiguration
 from utils.graph_client import GraphClient
+from utils.odata import quote_odata
 
 logger = logging.getLogger(__name__)
 
@@ -12,7 +13,7 @@ async def get_all_managed_devices(graph_client: GraphClient, filter_os: Optional
         client = graph_client.get_client()
         query_params = ManagedDevicesRequestBuilder.ManagedDevicesRequestBuilderGetQueryParameters()
         if filter_os:
-            query_params.filter = f"operatingSystem eq '{filter_os}'"
+            query_params.filter = f"operatingSystem eq '{quote_odata(filter_os)}'"
         request_configuration = RequestConfiguration(query_parameters=query_params)
         request_configuration.headers.add("ConsistencyLevel", "eventual")
         response = await client.device_management.managed_devices.get(request_configuration=request_configuration)
@@ -49,7 +50,7 @@ async def get_managed_devices_by_user(graph_client: GraphClient, user_id: str) -
     try:
         client = graph_client.get_client()
         query_params = ManagedDevicesRequestBuilder.ManagedDevicesRequestBuilderGetQueryParameters(
-            filter=f"userId eq '{user_id}'"
+            filter=f"userId eq '{quote_odata(user_id)}'"
         )
         request_configuration = RequestConfiguration(query_parameters=query_params)
         request_configuration.headers.add("ConsistencyLevel", "eventual")
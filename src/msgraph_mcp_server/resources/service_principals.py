@@ -6,10 +6,20 @@ This module provides access to Microsoft Graph service principal resources.
 import logging
 from typing import Dict, List, Any, Optional
 from utils.graph_client import GraphClient
+from utils.odata import quote_odata
 from msgraph.generated.models.service_principal import ServicePrincipal
+from msgraph.generated.service_principals.service_principals_request_builder import ServicePrincipalsRequestBuilder
+from kiota_abstractions.base_request_configuration import RequestConfiguration
 
 logger = logging.getLogger(__name__)
 
+def _invalidate_application_cache() -> None:
+    """Drop cached application reads that embed service principal lookups or permissions."""
+    # Imported here since the applications module imports this one
+    from .applications import clear_sp_cache, get_application_by_id
+    clear_sp_cache()
+    get_application_by_id.cache_clear()
+
 async def list_service_principals(graph_client: GraphClient, limit: int = 100) -> List[Dict[str, Any]]:
     """List all service principals in the tenant, with paging."""
     try:
@@ -45,8 +55,13 @@ async def get_service_principal_by_app_id(graph_client: GraphClient, app_id: str
     try:
         client = graph_client.get_client()
         # Filter by appId
-        filter_query = f"appId eq '{app_id}'"
-        response = await client.service_principals.get(query_parameters={"$filter": filter_query})
+        filter_query = f"appId eq '{quote_odata(app_id)}'"
+        query_params = ServicePrincipalsRequestBuilder.ServicePrincipalsRequestBuilderGetQueryParameters(
+            filter=filter_query,
+            top=1
+        )
+        request_configuration = RequestConfiguration(query_parameters=query_params)
+        response = await client.service_principals.get(request_configuration=request_configuration)
         if response and response.value:
             return response.value[0]  # Return the first match
         return None
@@ -141,6 +156,7 @@ async def create_service_principal(graph_client: GraphClient, sp_data: Dict[str,
         if 'displayName' in sp_data:
             sp.display_name = sp_data['displayName']
         new_sp = await client.service_principals.post(sp)
+        _invalidate_application_cache()
         if new_sp:
             return {
                 'id': getattr(new_sp, 'id', '') or '',
@@ -182,6 +198,7 @@ async def delete_service_principal(graph_client: GraphClient, sp_id: str) -> boo
     try:
         client = graph_client.get_client()
         await client.service_principals.by_service_principal_id(sp_id).delete()
+        _invalidate_application_cache()
         return True
     except Exception as e:
         logger.error(f"Error deleting service principal {sp_id}: {str(e)}")
@@ -4,133 +4,229 @@ This module provides access to Microsoft Graph sign-in logs.
 """
 
 import logging
-from typing import Dict, List, Optional, Any
+from contextlib import aclosing
+from typing import AsyncIterator, Dict, List, Optional, Any, Sequence
 from datetime import datetime, timedelta, timezone
 
 from msgraph.generated.audit_logs.sign_ins.sign_ins_request_builder import SignInsRequestBuilder
+from msgraph.generated.models.risk_detail import RiskDetail
+from msgraph.generated.models.risk_level import RiskLevel
+from msgraph.generated.models.risk_state import RiskState
 from kiota_abstractions.base_request_configuration import RequestConfiguration
+from kiota_serialization_json.json_parse_node import JsonParseNode
 
+from utils.cache import async_ttl_cache
 from utils.graph_client import GraphClient
+from utils.odata import quote_odata
+from utils.paging import JsonPage, format_pages, iter_concurrently, iter_pages, time_range_filters
 
 logger = logging.getLogger(__name__)
 
-async def get_user_sign_in_logs(graph_client: GraphClient, user_id: str, days: int = 7) -> List[Dict[str, Any]]:
-    """Get sign-in logs for a specific user within the last N days.
+# Sign-in properties used by the formatter below; requested via $select since
+# the default sign-in payload is very large
+_SIGN_IN_SELECT = [
+    "id", "createdDateTime", "userId", "userDisplayName", "userPrincipalName", "appDisplayName", "appId",
+    "ipAddress", "clientAppUsed", "correlationId", "isInteractive", "resourceDisplayName", "status",
+    "riskDetail", "riskLevelAggregated", "riskLevelDuringSignIn", "riskState", "riskEventTypes_v2",
+    "deviceDetail", "location",
+]
+# Filter for one date window of a user's sign-ins; uid must be passed through quote_odata
+_SIGN_IN_FILTER_TMPL = "{range_filter} and userId eq '{uid}'"
+# Sign-in categories callers can narrow the query to, as OData filter clauses;
+# several categories are combined with "or"
+SIGN_IN_CATEGORY_FILTERS = {
+    "interactive": "isInteractive eq true",
+    "failures": "status/errorCode ne 0",
+}
+
+# str() of every risk enum member keyed by its wire value, so raw JSON values
+# format exactly like the SDK enums did
+_RISK_DETAIL_STR = {detail.value: str(detail) for detail in RiskDetail}
+_RISK_LEVEL_STR = {level.value: str(level) for level in RiskLevel}
+_RISK_STATE_STR = {state.value: str(state) for state in RiskState}
+
+async def _get_sign_in_page(graph_client: GraphClient, request_info) -> JsonPage:
+    """Fetch one page of sign-ins as decoded JSON."""
+    return JsonPage.from_body(await graph_client.get_json(request_info))
+
+def _category_filter(categories: Optional[Sequence[str]]) -> str:
+    """Build the filter clause restricting sign-ins to the given categories ('' for all sign-ins)."""
+    if not categories:
+        return ''
+    # A single category passed as a bare string would otherwise be iterated per character
+    if isinstance(categories, str):
+        categories = [categories]
+    unknown = [category for category in categories if category not in SIGN_IN_CATEGORY_FILTERS]
+    if unknown:
+        raise ValueError(
+            f"Unknown sign-in categories: {', '.join(unknown)}. "
+            f"Valid categories are: {', '.join(SIGN_IN_CATEGORY_FILTERS)}"
+        )
+    clauses = [SIGN_IN_CATEGORY_FILTERS[category] for category in dict.fromkeys(categories)]
+    if len(clauses) == 1:
+        return f" and {clauses[0]}"
+    return f" and ({' or '.join(clauses)})"
+
+def _format_datetime(value: Optional[str]) -> str:
+    """Format a Graph datetime string like the SDK models' datetime.isoformat() did ('' if missing)."""
+    parsed = JsonParseNode(value).get_datetime_value() if value else None
+    return parsed.isoformat() if parsed else ''
+
+def _format_sign_in(log: Dict[str, Any]) -> Dict[str, Any]:
+    """Format a sign-in record decoded from JSON."""
+    status = log.get('status')
+    is_interactive = log.get('isInteractive')
+    # Format each log entry with comprehensive fields
+    log_data = {
+        "id": log.get('id') or '',
+        "createdDateTime": _format_datetime(log.get('createdDateTime')),
+        "userId": log.get('userId') or '',
+        "userDisplayName": log.get('userDisplayName') or '',
+        "userPrincipalName": log.get('userPrincipalName') or '',
+        "appDisplayName": log.get('appDisplayName') or '',
+        "appId": log.get('appId') or '',
+        "ipAddress": log.get('ipAddress') or '',
+        "clientAppUsed": log.get('clientAppUsed') or '',
+        "correlationId": log.get('correlationId') or '',
+        "isInteractive": is_interactive if is_interactive is not None else False,
+        "resourceDisplayName": log.get('resourceDisplayName') or '',
+        "status": {
+            "errorCode": status.get('errorCode') if status and status.get('errorCode') is not None else 0,
+            "failureReason": status.get('failureReason') if status else '',
+            "additionalDetails": status.get('additionalDetails') if status else ''
+        },
+        "riskInformation": {
+            "riskDetail": _RISK_DETAIL_STR.get(log.get('riskDetail'), ''),
+            "riskLevelAggregated": _RISK_LEVEL_STR.get(log.get('riskLevelAggregated'), ''),
+            "riskLevelDuringSignIn": _RISK_LEVEL_STR.get(log.get('riskLevelDuringSignIn'), ''),
+            "riskState": _RISK_STATE_STR.get(log.get('riskState'), ''),
+            "riskEventTypes": log.get('riskEventTypes_v2') or []
+        }
+    }
+    
+    # Add device details if available
+    device = log.get('deviceDetail')
+    if device:
+        log_data["deviceDetail"] = {
+            "deviceId": device.get('deviceId') or '',
+            "displayName": device.get('displayName') or '',
+            "operatingSystem": device.get('operatingSystem') or '',
+            "browser": device.get('browser') or '',
+            "isCompliant": device.get('isCompliant') if device.get('isCompliant') is not None else False,
+            "isManaged": device.get('isManaged') if device.get('isManaged') is not None else False,
+            "trustType": device.get('trustType') or ''
+        }
+    
+    # Add location if available
+    location = log.get('location')
+    if location:
+        log_data["location"] = {
+            "city": location.get('city') or '',
+            "state": location.get('state') or '',
+            "countryOrRegion": location.get('countryOrRegion') or '',
+            "coordinates": {}
+        }
+
+        # Add coordinates if available
+        geo_coordinates = location.get('geoCoordinates')
+        if geo_coordinates:
+            log_data["location"]["coordinates"] = {
+                "latitude": geo_coordinates.get('latitude') if geo_coordinates.get('latitude') is not None else 0.0,
+                "longitude": geo_coordinates.get('longitude') if geo_coordinates.get('longitude') is not None else 0.0
+            }
+    return log_data
+
+async def _fetch_sign_in_window(graph_client: GraphClient, filter_query: str) -> AsyncIterator[List[Dict[str, Any]]]:
+    """Page through sign-ins matching filter_query, newest first, yielding formatted chunks."""
+    # Set up query parameters using SignInsRequestBuilder
+    query_params = SignInsRequestBuilder.SignInsRequestBuilderGetQueryParameters(
+        filter=filter_query,
+        select=_SIGN_IN_SELECT,
+        orderby=['createdDateTime desc'],
+        top=1000  # Increased from default to get more logs
+    )
+    
+    # Create request configuration
+    request_configuration = RequestConfiguration(
+        query_parameters=query_params
+    )
+    request_configuration.headers.add("ConsistencyLevel", "eventual")
+    
+    # Execute the request, following paging with the next page prefetched and
+    # formatting pages while the following ones are fetched.
+    # Pages are decoded as plain JSON: hydrating SDK models for up to 1000
+    # sign-ins per page dominates CPU time and the formatter only reads a
+    # handful of fields.
+    sign_ins = graph_client.get_client().audit_logs.sign_ins
+    async for chunk in format_pages(
+        iter_pages(
+            _get_sign_in_page(graph_client, sign_ins.to_get_request_information(request_configuration)),
+            lambda next_link: _get_sign_in_page(graph_client, sign_ins.with_url(next_link).to_get_request_information(request_configuration)),
+        ),
+        _format_sign_in,
+    ):
+        yield chunk
+
+async def stream_user_sign_in_logs(graph_client: GraphClient, user_id: str, days: int = 7, categories: Optional[Sequence[str]] = None) -> AsyncIterator[Dict[str, Any]]:
+    """Yield sign-in logs for a specific user within the last N days, newest first.
     
     Args:
         graph_client: GraphClient instance
         user_id: The unique identifier of the user.
         days: The number of past days to retrieve logs for (default: 7).
+        categories: Only return sign-ins in any of these categories, filtered
+            server-side ("interactive", "failures"). All sign-ins by default.
         
-    Returns:
-        A list of dictionaries, each representing a sign-in log event.
+    Yields:
+        Dictionaries, each representing a sign-in log event.
     """
     try:
-        client = graph_client.get_client()
-        
         # Calculate date range
         end_date = datetime.now(timezone.utc)
         start_date = end_date - timedelta(days=days)
         
-        # Format dates for query using the exact format from documentation
-        start_date_str = start_date.strftime('%Y-%m-%dT%H:%M:%SZ')
-        end_date_str = end_date.strftime('%Y-%m-%dT%H:%M:%SZ')
-        
-        # Define the OData filter query with proper formatting
-        filter_query = f"createdDateTime ge {start_date_str} and createdDateTime le {end_date_str} and userId eq '{user_id}'"
+        # Define one OData filter query per date window
+        uid = quote_odata(user_id)
+        category_filter = _category_filter(categories)
+        filter_queries = [
+            _SIGN_IN_FILTER_TMPL.format(uid=uid, range_filter=range_filter) + category_filter
+            for range_filter in time_range_filters("createdDateTime", start_date, end_date)
+        ]
         
         logger.info(f"Fetching sign-in logs for user ID: {user_id}")
-        logger.info(f"Date range: {start_date_str} to {end_date_str}")
-        logger.info(f"Filter query: {filter_query}")
+        logger.info(f"Date range: {start_date.strftime('%Y-%m-%dT%H:%M:%SZ')} to {end_date.strftime('%Y-%m-%dT%H:%M:%SZ')}")
+        logger.info(f"Filter queries: {filter_queries}")
         
-        # Set up query parameters using SignInsRequestBuilder
-        query_params = SignInsRequestBuilder.SignInsRequestBuilderGetQueryParameters(
-            filter=filter_query,
-            orderby=['createdDateTime desc'],
-            top=1000  # Increased from default to get more logs
-        )
-        
-        # Create request configuration
-        request_configuration = RequestConfiguration(
-            query_parameters=query_params
-        )
-        request_configuration.headers.add("ConsistencyLevel", "eventual")
-        
-        # Execute the request
-        sign_ins = await client.audit_logs.sign_ins.get(request_configuration=request_configuration)
-
-        formatted_logs = []
-        if sign_ins and sign_ins.value:
-            logger.info(f"Found {len(sign_ins.value)} sign-in records")
-            
-            for log in sign_ins.value:
-                # Format each log entry with comprehensive fields
-                log_data = {
-                    "id": log.id or '',
-                    "createdDateTime": log.created_date_time.isoformat() if log.created_date_time else '',
-                    "userId": log.user_id or '',
-                    "userDisplayName": log.user_display_name or '',
-                    "userPrincipalName": log.user_principal_name or '',
-                    "appDisplayName": log.app_display_name or '',
-                    "appId": log.app_id or '',
-                    "ipAddress": log.ip_address or '',
-                    "clientAppUsed": log.client_app_used or '',
-                    "correlationId": log.correlation_id or '',
-                    "isInteractive": log.is_interactive if log.is_interactive is not None else False,
-                    "resourceDisplayName": log.resource_display_name or '',
-                    "status": {
-                        "errorCode": log.status.error_code if log.status and log.status.error_code is not None else 0,
-                        "failureReason": log.status.failure_reason if log.status else '',
-                        "additionalDetails": log.status.additional_details if log.status else ''
-                    },
-                    "riskInformation": {
-                        "riskDetail": str(log.risk_detail) if log.risk_detail else '',
-                        "riskLevelAggregated": str(log.risk_level_aggregated) if log.risk_level_aggregated else '',
-                        "riskLevelDuringSignIn": str(log.risk_level_during_sign_in) if log.risk_level_during_sign_in else '',
-                        "riskState": str(log.risk_state) if log.risk_state else '',
-                        "riskEventTypes": log.risk_event_types_v2 if hasattr(log, 'risk_event_types_v2') and log.risk_event_types_v2 else []
-                    }
-                }
-                
-                # Add device details if available
-                if hasattr(log, 'device_detail') and log.device_detail:
-                    device = log.device_detail
-                    log_data["deviceDetail"] = {
-                        "deviceId": device.device_id or '',
-                        "displayName": device.display_name or '',
-                        "operatingSystem": device.operating_system or '',
-                        "browser": device.browser or '',
-                        "isCompliant": device.is_compliant if device.is_compliant is not None else False,
-                        "isManaged": device.is_managed if device.is_managed is not None else False,
-                        "trustType": device.trust_type or ''
-                    }
-                
-                # Add location if available
-                if hasattr(log, 'location') and log.location:
-                    location = log.location
-                    log_data["location"] = {
-                        "city": location.city or '',
-                        "state": location.state or '',
-                        "countryOrRegion": location.country_or_region or '',
-                        "coordinates": {}
-                    }
-
-                    # Add coordinates if available
-                    if hasattr(location, 'geo_coordinates') and location.geo_coordinates:
-                        log_data["location"]["coordinates"] = {
-                            "latitude": location.geo_coordinates.latitude if location.geo_coordinates.latitude is not None else 0.0,
-                            "longitude": location.geo_coordinates.longitude if location.geo_coordinates.longitude is not None else 0.0
-                        }
-                
-                formatted_logs.append(log_data)
-        else:
-            logger.info(f"No sign-in logs found for user {user_id} in the last {days} days.")
-            
-        return formatted_logs
+        async with aclosing(iter_concurrently(
+            _fetch_sign_in_window(graph_client, filter_query) for filter_query in filter_queries
+        )) as logs:
+            async for log_data in logs:
+                yield log_data
         
     except Exception as e:
         logger.error(f"Error fetching sign-in logs for user {user_id}: {str(e)}")
         # Check for permission errors specifically
         if "Authorization_RequestDenied" in str(e):
              logger.error("Permission denied. Ensure the application has AuditLog.Read.All permission.")
-        raise 
\ No newline at end of file
+        raise 
+
+@async_ttl_cache(ttl=60, maxsize=256)
+async def get_user_sign_in_logs(graph_client: GraphClient, user_id: str, days: int = 7, categories: Optional[Sequence[str]] = None) -> List[Dict[str, Any]]:
+    """Get sign-in logs for a specific user within the last N days.
+    
+    Args:
+        graph_client: GraphClient instance
+        user_id: The unique identifier of the user.
+        days: The number of past days to retrieve logs for (default: 7).
+        categories: Only return sign-ins in any of these categories, filtered
+            server-side ("interactive", "failures"). All sign-ins by default.
+        
+    Returns:
+        A list of dictionaries, each representing a sign-in log event.
+    """
+    formatted_logs = [log async for log in stream_user_sign_in_logs(graph_client, user_id, days, categories)]
+    if formatted_logs:
+        logger.info(f"Found {len(formatted_logs)} sign-in records")
+    else:
+        logger.info(f"No sign-in logs found for user {user_id} in the last {days} days.")
+    return formatted_logs
@@ -5,7 +5,7 @@ interacting with Microsoft Graph services.
 """
 
 import logging
-from typing import Dict, List, Any
+from typing import Dict, List, Any, Optional
 from fastmcp import FastMCP, Context
 
 from auth.graph_auth import GraphAuthManager, AuthenticationError
@@ -87,7 +87,7 @@ async def get_user_by_id(user_id: str, ctx: Context) -> Dict[str, Any]:
         raise
 
 @mcp.tool()
-async def get_user_sign_ins(user_id: str, ctx: Context, days: int = 7) -> List[Dict[str, Any]]:
+async def get_user_sign_ins(user_id: str, ctx: Context, days: int = 7, categories: Optional[List[str]] = None) -> List[Dict[str, Any]]:
     """Get sign-in logs for a specific user within the last N days.
 
     Requires AuditLog.Read.All permission.
@@ -96,6 +96,8 @@ async def get_user_sign_ins(user_id: str, ctx: Context, days: int = 7) -> List[D
         user_id: The unique identifier (ID) of the user.
         ctx: Context object
         days: The number of past days to retrieve logs for (default: 7).
+        categories: Only return sign-ins in any of these categories: "interactive"
+            (interactive sign-ins) and/or "failures" (failed sign-ins). All sign-ins by default.
         
     Returns:
         A list of dictionaries, each representing a sign-in log event.
@@ -103,7 +105,7 @@ async def get_user_sign_ins(user_id: str, ctx: Context, days: int = 7) -> List[D
     await ctx.info(f"Fetching sign-in logs for user {user_id} for the last {days} days...")
     
     try:
-        logs = await signin_logs.get_user_sign_in_logs(graph_client, user_id, days)
+        logs = await signin_logs.get_user_sign_in_logs(graph_client, user_id, days, categories)
         await ctx.report_progress(progress=100, total=100)
         if not logs:
             await ctx.info(f"No sign-in logs found for user {user_id} in the last {days} days.")
@@ -823,11 +825,11 @@ async def create_application(ctx: Context, app_data: Dict[str, Any]) -> Dict[str
         raise
 
 @mcp.tool()
-async def update_application(app_id: str, ctx: Context, app_data: Dict[str, Any]) -> Dict[str, Any]:
-    """Update an existing application (app registration)."""
+async def update_application(app_id: str, ctx: Context, app_data: Dict[str, Any], return_full: bool = False) -> Dict[str, Any]:
+    """Update an existing application (app registration). Set return_full to also re-fetch the application with its permissions."""
     await ctx.info(f"Updating application {app_id}...")
     try:
-        result = await applications.update_application(graph_client, app_id, app_data)
+        result = await applications.update_application(graph_client, app_id, app_data, return_full)
         await ctx.report_progress(progress=100, total=100)
         await ctx.info(f"Successfully updated application {app_id}")
         return result
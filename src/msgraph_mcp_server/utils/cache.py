@@ -0,0 +1,104 @@
+"""In-memory caching utilities.
+
+This module provides a TTL + LRU cache decorator for idempotent async Graph reads.
+"""
+
+import asyncio
+import functools
+import inspect
+import time
+from collections import OrderedDict
+from typing import Any, Awaitable, Callable, Dict, Hashable, Tuple
+
+
+def _freeze(value: Any) -> Hashable:
+    """Convert list, set and dict arguments into hashable equivalents for use in a cache key."""
+    if isinstance(value, (list, tuple)):
+        return tuple(_freeze(item) for item in value)
+    if isinstance(value, (set, frozenset)):
+        return frozenset(_freeze(item) for item in value)
+    if isinstance(value, dict):
+        return tuple(sorted((key, _freeze(item)) for key, item in value.items()))
+    return value
+
+
+def async_ttl_cache(ttl: float = 60, maxsize: int = 256):
+    """Cache the results of an async function for ttl seconds, keyed by its arguments.
+
+    Calls are keyed on their bound arguments (defaults applied), so positional
+    and keyword calls share entries. At most maxsize results are kept, evicting
+    the least recently used. Concurrent calls with the same arguments share a
+    single in-flight call instead of each querying Graph; exceptions are not
+    cached, and calls whose arguments cannot be hashed bypass the cache.
+    Cached results are returned as-is, so callers must not mutate them.
+
+    The decorated function gains two helpers:
+        cache_invalidate(*args, **kwargs): drop the entry for these arguments
+        cache_clear(): drop all entries
+    Both also keep calls still in flight from storing their results, so a
+    decorated function can invalidate its own arguments to avoid caching a
+    degraded result.
+
+    Args:
+        ttl: Seconds a result stays valid (default: 60)
+        maxsize: Maximum number of cached results (default: 256)
+    """
+    def decorator(func: Callable[..., Awaitable[Any]]):
+        signature = inspect.signature(func)
+        results: "OrderedDict[Hashable, Tuple[float, Any]]" = OrderedDict()
+        in_flight: Dict[Hashable, asyncio.Task] = {}
+
+        def make_key(args, kwargs) -> Hashable:
+            bound = signature.bind(*args, **kwargs)
+            bound.apply_defaults()
+            return tuple((name, _freeze(value)) for name, value in bound.arguments.items())
+
+        async def call_and_store(key: Hashable, args, kwargs) -> Any:
+            result = await func(*args, **kwargs)
+            # Skip storing if the entry was invalidated while the call was running
+            if in_flight.get(key) is asyncio.current_task():
+                results[key] = (time.monotonic(), result)
+                results.move_to_end(key)
+                while len(results) > maxsize:
+                    results.popitem(last=False)
+            return result
+
+        def forget(key: Hashable, task: asyncio.Task) -> None:
+            if in_flight.get(key) is task:
+                del in_flight[key]
+
+        @functools.wraps(func)
+        async def wrapper(*args, **kwargs):
+            key = make_key(args, kwargs)
+            try:
+                cached = results.get(key)
+            except TypeError:
+                # Arguments that cannot be hashed are not cached
+                return await func(*args, **kwargs)
+            if cached is not None:
+                if time.monotonic() - cached[0] < ttl:
+                    results.move_to_end(key)
+                    return cached[1]
+                del results[key]
+            task = in_flight.get(key)
+            if task is None:
+                task = asyncio.ensure_future(call_and_store(key, args, kwargs))
+                in_flight[key] = task
+                task.add_done_callback(functools.partial(forget, key))
+            # Shield the shared call so one caller being cancelled does not cancel it for the others
+            return await asyncio.shield(task)
+
+        def cache_invalidate(*args, **kwargs) -> None:
+            key = make_key(args, kwargs)
+            results.pop(key, None)
+            in_flight.pop(key, None)
+
+        def cache_clear() -> None:
+            results.clear()
+            in_flight.clear()
+
+        wrapper.cache_invalidate = cache_invalidate
+        wrapper.cache_clear = cache_clear
+        return wrapper
+
+    return decorator
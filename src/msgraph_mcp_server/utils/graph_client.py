@@ -3,10 +3,13 @@
 This module provides a utility class for making requests to the Microsoft Graph API.
 """
 
+import json
 import logging
 from typing import Any, Dict, List, Optional
 
+from kiota_abstractions.request_information import RequestInformation
 from msgraph import GraphServiceClient
+from msgraph.generated.models.o_data_errors.o_data_error import ODataError
 
 from auth.graph_auth import GraphAuthManager
 
@@ -62,4 +65,28 @@ class GraphClient:
             self.logger.error(f"Error executing Graph API request: {str(e)}")
             if "Authorization_RequestDenied" in str(e):
                 self.logger.error("Permission denied. Check application permissions.")
-            raise
\ No newline at end of file
+            raise
+
+    async def get_json(self, request_info: RequestInformation) -> Optional[Dict[str, Any]]:
+        """Send a request and decode the JSON response body without building SDK models.
+        
+        The request still goes through the Graph client's request adapter, so
+        authentication, retries and error handling are the same as for the
+        typed request builders.
+        
+        Args:
+            request_info: Request information, e.g. from a request builder's
+                to_get_request_information()
+            
+        Returns:
+            The decoded JSON body, or None if the response has no content
+            
+        Raises:
+            ODataError: If Graph returns an error response
+        """
+        content = await self.get_client().request_adapter.send_primitive_async(
+            request_info, "bytes", {"XXX": ODataError}
+        )
+        if not content:
+            return None
+        return json.loads(content)
@@ -0,0 +1,20 @@
+"""OData query helpers for Microsoft Graph.
+
+This module provides helpers for building OData $filter expressions safely.
+"""
+
+
+def quote_odata(value: str) -> str:
+    """Escape a value for use inside a single-quoted OData string literal.
+
+    OData escapes a single quote by doubling it, so a value such as
+    "o'brien" becomes "o''brien". Without this, a value containing a quote
+    could end the literal early and change the meaning of the filter.
+
+    Args:
+        value: The raw value to embed in a filter
+
+    Returns:
+        The escaped value, without surrounding quotes
+    """
+    return str(value).replace("'", "''")
@@ -0,0 +1,196 @@
+"""Paging utilities for Microsoft Graph collection responses.
+
+This module provides an async page iterator that prefetches the next page
+while the caller is still processing the current one, a pipeline that formats
+pages while later ones are still being fetched, and helpers to fan a
+time-ranged query out over several concurrent windows.
+"""
+
+import asyncio
+from contextlib import aclosing
+from datetime import datetime
+from typing import Any, AsyncGenerator, AsyncIterator, Awaitable, Callable, Dict, Iterable, List, NamedTuple, Optional, TypeVar
+
+T = TypeVar('T')
+R = TypeVar('R')
+
+# Default maximum number of windows time_range_filters splits a range into; kept
+# small since the windows are paged concurrently and Graph throttles bursts
+MAX_TIME_WINDOWS = 4
+
+
+class JsonPage(NamedTuple):
+    """A collection page decoded straight from JSON, usable with iter_pages."""
+
+    value: List[Dict[str, Any]]
+    odata_next_link: Optional[str]
+
+    @classmethod
+    def from_body(cls, body: Optional[Dict[str, Any]]) -> "JsonPage":
+        """Build a page from a decoded Graph collection response body."""
+        body = body or {}
+        return cls(body.get('value') or [], body.get('@odata.nextLink'))
+
+
+async def iter_pages(
+    first_page: Awaitable[Any],
+    fetch_next: Callable[[str], Awaitable[Any]],
+) -> AsyncIterator[List[Any]]:
+    """Iterate over the pages of a Graph collection, prefetching ahead.
+
+    As soon as a page arrives, the request for the page referenced by its
+    odata_next_link is scheduled before the current page's records are
+    yielded, so network latency overlaps with the caller's processing.
+
+    Callers that may stop before the last page should wrap the iterator in
+    contextlib.aclosing() so the outstanding prefetch is cancelled promptly.
+
+    Args:
+        first_page: Awaitable returning the first collection response
+        fetch_next: Callable taking an odata_next_link and returning an
+            awaitable for that page
+
+    Yields:
+        The list of records (response.value) of each non-empty page
+    """
+    next_task: Optional[asyncio.Task] = None
+    try:
+        response = await first_page
+        while response is not None:
+            next_link = getattr(response, 'odata_next_link', None)
+            next_task = asyncio.create_task(fetch_next(next_link)) if next_link else None
+            if response.value:
+                yield response.value
+            if next_task is None:
+                break
+            response = await next_task
+            next_task = None
+    finally:
+        if next_task is not None and not next_task.done():
+            next_task.cancel()
+
+
+async def _feed(source: AsyncGenerator[T, None], queue: asyncio.Queue) -> None:
+    """Put every item of source into queue, then None, or the exception that stopped it.
+
+    The source is closed on exit, so cancelling the feed while it is blocked
+    on a full queue still runs the source's cleanup (e.g. iter_pages
+    cancelling its prefetch) right away.
+    """
+    try:
+        async with aclosing(source):
+            async for item in source:
+                await queue.put(item)
+    except Exception as e:
+        await queue.put(e)
+    else:
+        await queue.put(None)
+
+
+async def _take(queue: asyncio.Queue) -> Optional[Any]:
+    """Get the next item fed by _feed, re-raising the source's exception."""
+    item = await queue.get()
+    if isinstance(item, Exception):
+        raise item
+    return item
+
+
+async def format_pages(
+    pages: AsyncGenerator[List[T], None],
+    format_item: Callable[[T], R],
+    max_pending: int = 2,
+    chunk_size: int = 100,
+) -> AsyncIterator[List[R]]:
+    """Format the records of a page iterator while later pages are still being fetched.
+
+    A producer task pulls pages into a queue holding at most max_pending pages,
+    so paging runs ahead of formatting without buffering the whole collection.
+    Records are formatted and yielded in chunks of chunk_size, yielding to the
+    event loop between chunks so in-flight responses keep being read.
+
+    Args:
+        pages: Async generator of record lists, e.g. from iter_pages
+        format_item: Function formatting a single record
+        max_pending: Maximum number of fetched pages waiting to be formatted
+        chunk_size: Number of records formatted between event loop yields
+
+    Yields:
+        Lists of formatted records, in page order
+    """
+    queue: asyncio.Queue = asyncio.Queue(maxsize=max_pending)
+    producer = asyncio.create_task(_feed(pages, queue))
+    try:
+        while (page := await _take(queue)) is not None:
+            for start in range(0, len(page), chunk_size):
+                yield [format_item(item) for item in page[start:start + chunk_size]]
+                await asyncio.sleep(0)
+    finally:
+        # Stops paging (and cancels its prefetch) if formatting failed or was closed early,
+        # waiting for it so the page iterator is closed by the time this returns
+        producer.cancel()
+        await asyncio.gather(producer, return_exceptions=True)
+
+
+def time_range_filters(field: str, start: datetime, end: datetime, parts: Optional[int] = None) -> List[str]:
+    """Split [start, end] into consecutive OData range filters on a datetime field.
+
+    Windows are returned newest first and are disjoint: every window uses
+    "ge start and lt end" except the newest one, which keeps "le end" so
+    the union matches a single "ge start and le end" filter. They are meant
+    to be paged concurrently with iter_concurrently, which yields the newest
+    window's records as its pages arrive and buffers the older windows until
+    their turn.
+
+    Args:
+        field: The datetime property to filter on, e.g. "createdDateTime"
+        start: Start of the range
+        end: End of the range
+        parts: Number of windows to split the range into (default: one per
+            whole day in the range, at most MAX_TIME_WINDOWS)
+
+    Returns:
+        A list of OData filter expressions, newest window first
+    """
+    if parts is None:
+        parts = min(MAX_TIME_WINDOWS, (end - start).days)
+    parts = max(1, parts)
+    step = (end - start) / parts
+    bounds = [
+        (start + step * i).strftime('%Y-%m-%dT%H:%M:%SZ') for i in range(parts)
+    ] + [end.strftime('%Y-%m-%dT%H:%M:%SZ')]
+    filters = []
+    for i in reversed(range(parts)):
+        end_op = 'le' if i == parts - 1 else 'lt'
+        filters.append(f"{field} ge {bounds[i]} and {field} {end_op} {bounds[i + 1]}")
+    return filters
+
+
+async def iter_concurrently(sources: Iterable[AsyncGenerator[List[T], None]]) -> AsyncIterator[T]:
+    """Run chunked async iterators concurrently and yield their items in order.
+
+    Items of the first iterator are yielded as soon as each of its chunks
+    arrives, while the others keep running with their chunks buffered until
+    their turn. Closing the iterator early cancels whatever is still running.
+
+    Args:
+        sources: Async generators each yielding lists of items, e.g. from format_pages
+
+    Yields:
+        The items of each iterator, in the order the iterators were given
+    """
+    queues: List[asyncio.Queue] = []
+    tasks: List[asyncio.Task] = []
+    for source in sources:
+        queue: asyncio.Queue = asyncio.Queue()
+        queues.append(queue)
+        tasks.append(asyncio.create_task(_feed(source, queue)))
+    try:
+        for queue in queues:
+            while (chunk := await _take(queue)) is not None:
+                for item in chunk:
+                    yield item
+    finally:
+        for task in tasks:
+            if not task.done():
+                task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)